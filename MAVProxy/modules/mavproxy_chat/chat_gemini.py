@@ -10,16 +10,225 @@ import time
 import re
 from datetime import datetime
 from threading import Thread, Lock
+import asyncio
+import heapq
+import itertools
 import json
 import math
+import functools
 from MAVProxy.modules.lib import param_help
 import os
+from pathlib import Path
 
 try:
     import google.generativeai as genai
+    import google.ai.generativelanguage as glm
 except ImportError:
     print("chat: failed to import google.generativeai. Install with: pip install google-generativeai")
 
+# optional, used to reload the API key when the key file is changed by another process (Linux only)
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+# Gemini model name
+GEMINI_MODEL = "gemini-1.5-pro"
+
+# number of contents (messages) kept in the chat history before the oldest are summarised
+HISTORY_MAX_CONTENTS = 20
+
+# prompt used to summarise older chat history
+HISTORY_SUMMARY_PROMPT = ("Summarise the following conversation as a concise bullet list, "
+                          "keeping any facts, settings and values needed to continue it:\n")
+
+# maximum time to wait for the vehicle to confirm parameters sent by set_parameters
+SET_PARAMETERS_TIMEOUT = 2
+
+# tools that change the vehicle, these are run one at a time as each waits for its own
+# PARAM_VALUE or COMMAND_ACK and discards any other acknowledgements it receives
+VEHICLE_CHANGING_TOOLS = frozenset(["set_parameter", "set_parameters", "set_vehicle_mode"])
+
+# characters that indicate a parameter name is a regular expression
+REGEX_CHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+
+# compile a parameter name pattern, recently used patterns are cached
+@functools.lru_cache(maxsize=64)
+def compile_param_pattern(pattern):
+    return re.compile(pattern)
+
+
+# read an API key file, returns None if the file does not exist
+# cached so the file is only read again after save_api_key clears the cache
+@functools.lru_cache(maxsize=1)
+def read_api_key(path):
+    try:
+        return Path(path).read_text(errors='ignore').strip()
+    except FileNotFoundError:
+        return None
+
+
+# vehicle type string for each HEARTBEAT MAV_TYPE
+VEHICLE_TYPES = {
+    mavutil.mavlink.MAV_TYPE_FIXED_WING: "Plane",
+    mavutil.mavlink.MAV_TYPE_VTOL_DUOROTOR: "Plane",
+    mavutil.mavlink.MAV_TYPE_VTOL_QUADROTOR: "Plane",
+    mavutil.mavlink.MAV_TYPE_VTOL_TILTROTOR: "Plane",
+    mavutil.mavlink.MAV_TYPE_GROUND_ROVER: "Rover",
+    mavutil.mavlink.MAV_TYPE_SURFACE_BOAT: "Boat",
+    mavutil.mavlink.MAV_TYPE_SUBMARINE: "Sub",
+    mavutil.mavlink.MAV_TYPE_QUADROTOR: "Copter",
+    mavutil.mavlink.MAV_TYPE_COAXIAL: "Copter",
+    mavutil.mavlink.MAV_TYPE_HEXAROTOR: "Copter",
+    mavutil.mavlink.MAV_TYPE_OCTOROTOR: "Copter",
+    mavutil.mavlink.MAV_TYPE_TRICOPTER: "Copter",
+    mavutil.mavlink.MAV_TYPE_DODECAROTOR: "Copter",
+    mavutil.mavlink.MAV_TYPE_HELICOPTER: "Heli",
+    mavutil.mavlink.MAV_TYPE_ANTENNA_TRACKER: "Tracker",
+    mavutil.mavlink.MAV_TYPE_AIRSHIP: "Blimp",
+}
+
+# tools (functions) available to the Gemini model
+# the function called is the ChatGemini method with the same name
+TOOLS = {
+    "get_current_datetime": {
+        "description": "Get the current date and time",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "_dummy": {  # Add dummy property for functions with no params
+                    "type": "string",
+                    "description": "This parameter is not used"
+                }
+            },
+            "required": []
+        }
+    },
+    "get_vehicle_type": {
+        "description": "Get the type of vehicle (Copter, Plane, Rover, etc.)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "_dummy": {
+                    "type": "string",
+                    "description": "This parameter is not used"
+                }
+            },
+            "required": []
+        }
+    },
+    "get_vehicle_state": {
+        "description": "Get the current state of the vehicle including armed status and mode",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "_dummy": {
+                    "type": "string",
+                    "description": "This parameter is not used"
+                }
+            },
+            "required": []
+        }
+    },
+    "get_parameter": {
+        "description": "Get a vehicle parameter value",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "The name of the parameter to get"
+                }
+            },
+            "required": ["name"]
+        }
+    },
+    "set_parameter": {
+        "description": "Set a vehicle parameter value. Prefer set_parameters when setting more than one parameter",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "description": "The name of the parameter to set"
+                },
+                "value": {
+                    "type": "number",
+                    "description": "The value to set the parameter to"
+                }
+            },
+            "required": ["name", "value"]
+        }
+    },
+    "set_parameters": {
+        "description": "Set multiple vehicle parameter values at once",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "params": {
+                    "type": "array",
+                    "description": "The parameters to set",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {
+                                "type": "string",
+                                "description": "The name of the parameter to set"
+                            },
+                            "value": {
+                                "type": "number",
+                                "description": "The value to set the parameter to"
+                            }
+                        },
+                        "required": ["name", "value"]
+                    }
+                }
+            },
+            "required": ["params"]
+        }
+    },
+    "set_vehicle_mode": {
+        "description": "Set the vehicle flight mode",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "mode": {
+                    "type": "string",
+                    "description": "The mode to set (e.g., 'GUIDED', 'AUTO', 'STABILIZE', etc.)"
+                }
+            },
+            "required": ["mode"]
+        }
+    },
+    "set_wakeup_timer": {
+        "description": "Set a timer to send a message to the assistant after the specified number of seconds",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "seconds": {
+                    "type": "number",
+                    "description": "The number of seconds from now that the timer should expire"
+                },
+                "message": {
+                    "type": "string",
+                    "description": "The message to be sent to the assistant when the timer expires"
+                }
+            },
+            "required": ["seconds", "message"]
+        }
+    }
+}
+
+# tool declarations sent to Gemini, built once in sorted order so the prompt prefix is byte-identical across turns
+TOOL_CONFIGS = [{
+    "function_declarations": [{
+        "name": tool_name,
+        "description": TOOLS[tool_name]["description"],
+        "parameters": TOOLS[tool_name]["parameters"]
+    } for tool_name in sorted(TOOLS)]
+}]
+
 
 class ChatGemini:
     def __init__(self, mpstate, status_cb=None, reply_cb=None, wait_for_command_ack_fn=None):
@@ -33,248 +242,307 @@ class ChatGemini:
         # keep reference to wait_for_command_ack_fn
         self.wait_for_command_ack_fn = wait_for_command_ack_fn
 
-        # lock to prevent multiple threads sending text to the assistant at the same time
-        self.send_lock = Lock()
-
-        # wakeup timer array
-        self.wakeup_schedule = []
-        self.thread = Thread(target=self.check_wakeup_timers)
+        # event loop used for all Gemini requests, run in a separate thread
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever)
         self.thread.daemon = True
         self.thread.start()
 
+        # lock to prevent multiple requests on the chat session at the same time
+        # created on the event loop when first needed and never replaced
+        self.chat_lock = None
+
+        # wakeup timer heap of (time, seq, message) tuples, earliest first
+        # seq breaks ties so messages are never compared
+        # only accessed from the event loop thread
+        self.wakeup_schedule = []
+        self.wakeup_seq = itertools.count()
+        self.wakeup_handle = None
+
+        # held while a tool that changes the vehicle is running, other tool calls run concurrently
+        self.vehicle_lock = Lock()
+
+        # True once a request has succeeded, cleared if a request fails or the model is changed
+        self.connection_verified = False
+
+        # Model and chat history
+        # history holds recent contents, summary holds contents summarising older history
+        self.model = None
+        self.summary_model = None
+        self.history = []
+        self.summary = []
+        self.summary_text = ""
+
         # initialise Gemini connection
         self.api_key = None
         self.config_file = os.path.join(os.path.expanduser("~"), ".gemini_api_key")
         self.load_api_key()
-        
-        # Model and chat session
-        self.model = None
-        self.chat = None
-        
-        # Initialize with available tools
-        self.tools = self.define_tools()
+
+        # watch for the key file being changed by another process
+        if inotify_simple is not None:
+            self.key_watch_thread = Thread(target=self.watch_api_key)
+            self.key_watch_thread.daemon = True
+            self.key_watch_thread.start()
 
     def load_api_key(self):
         """Load API key from config file"""
-        import os
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    self.api_key = f.read().strip()
-                print("chat: Loaded Gemini API key from config file")
-                self.initialize_model()
-            except Exception as e:
-                print(f"chat: Failed to load API key: {e}")
+        try:
+            api_key = read_api_key(self.config_file)
+        except Exception as e:
+            print(f"chat: Failed to load API key: {e}")
+            return
+        if api_key is None:
+            return
+        self.api_key = api_key
+        print("chat: Loaded Gemini API key from config file")
+        self.initialize_model()
+
+    def watch_api_key(self):
+        """Reload the API key whenever the key file is written
+        this function never returns so it should be called from a new thread"""
+        # watch the directory as the file may not exist yet or may be replaced
+        try:
+            inotify = inotify_simple.INotify()
+            inotify.add_watch(os.path.dirname(self.config_file),
+                              inotify_simple.flags.CLOSE_WRITE | inotify_simple.flags.MOVED_TO)
+        except OSError as e:
+            print(f"chat: unable to watch Gemini API key file: {e}")
+            return
+        config_name = os.path.basename(self.config_file)
+        while True:
+            if any(event.name == config_name for event in inotify.read()):
+                read_api_key.cache_clear()
+                try:
+                    api_key = read_api_key(self.config_file)
+                except Exception as e:
+                    # keep watching, the file may be fixed later
+                    print(f"chat: Failed to load API key: {e}")
+                    continue
+                if api_key and api_key != self.api_key:
+                    self.api_key = api_key
+                    print("chat: Reloaded Gemini API key from config file")
+                    self.loop.call_soon_threadsafe(self.initialize_model)
 
     def save_api_key(self, api_key):
         """Save API key to config file"""
-        import os
         try:
-            with open(self.config_file, 'w') as f:
-                f.write(api_key)
+            # set the key before writing the file so the key file watcher does not see it as a new key
             self.api_key = api_key
+            # create the file readable only by the user
+            fd = os.open(self.config_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            # the mode above only applies to new files, also restrict an existing file
+            if hasattr(os, 'fchmod'):
+                os.fchmod(fd, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                f.write(api_key)
+            read_api_key.cache_clear()
             print("chat: Saved Gemini API key to config file")
             return self.initialize_model()
         except Exception as e:
             print(f"chat: Failed to save API key: {e}")
             return False
 
-    def initialize_model(self):
-        """Initialize the Gemini model with current API key"""
+    def initialize_model(self, reset_chat=True):
+        """Initialize the Gemini model with current API key
+        if reset_chat is True the chat history is cleared once any request in progress has finished"""
         try:
             genai.configure(api_key=self.api_key)
-            
-            # Define tool configurations
-            tool_configs = []
-            for tool_name, tool_info in self.tools.items():
-                tool_configs.append({
-                    "function_declarations": [{
-                        "name": tool_name,
-                        "description": tool_info["description"],
-                        "parameters": tool_info["parameters"]
-                    }]
-                })
-            
+
             # Create model with tools
-            self.model = genai.GenerativeModel(
-                "gemini-1.5-pro",
-                tools=tool_configs
-            )
-            self.chat = self.model.start_chat(history=[])
+            self.model = genai.GenerativeModel(GEMINI_MODEL, tools=TOOL_CONFIGS)
+            self.summary_model = genai.GenerativeModel(GEMINI_MODEL)
+            self.connection_verified = False
+            if reset_chat:
+                self.submit(self.reset_chat())
             print("chat: Successfully configured Gemini API")
             return True
         except Exception as e:
             print(f"chat: Failed to initialize Gemini model: {e}")
             return False
 
-    def define_tools(self):
-        """Define the tools (functions) available to the Gemini model"""
-        tools = {
-            "get_current_datetime": {
-                "description": "Get the current date and time",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "_dummy": {  # Add dummy property for functions with no params
-                            "type": "string",
-                            "description": "This parameter is not used"
-                        }
-                    },
-                    "required": []
-                },
-                "function": self.get_current_datetime
-            },
-            "get_vehicle_type": {
-                "description": "Get the type of vehicle (Copter, Plane, Rover, etc.)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "_dummy": {
-                            "type": "string",
-                            "description": "This parameter is not used"
-                        }
-                    },
-                    "required": []
-                },
-                "function": self.get_vehicle_type
-            },
-            "get_vehicle_state": {
-                "description": "Get the current state of the vehicle including armed status and mode",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "_dummy": {
-                            "type": "string",
-                            "description": "This parameter is not used"
-                        }
-                    },
-                    "required": []
-                },
-                "function": self.get_vehicle_state
-            },
-            # The other functions that already have properties are fine
-            "get_parameter": {
-                "description": "Get a vehicle parameter value",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "name": {
-                            "type": "string",
-                            "description": "The name of the parameter to get"
-                        }
-                    },
-                    "required": ["name"]
-                },
-                "function": self.get_parameter
-            },
-            "set_parameter": {
-                "description": "Set a vehicle parameter value",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "name": {
-                            "type": "string",
-                            "description": "The name of the parameter to set"
-                        },
-                        "value": {
-                            "type": "number",
-                            "description": "The value to set the parameter to"
-                        }
-                    },
-                    "required": ["name", "value"]
-                },
-                "function": self.set_parameter
-            },
-            "set_vehicle_mode": {
-                "description": "Set the vehicle flight mode",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "mode": {
-                            "type": "string",
-                            "description": "The mode to set (e.g., 'GUIDED', 'AUTO', 'STABILIZE', etc.)"
-                        }
-                    },
-                    "required": ["mode"]
-                },
-                "function": self.set_vehicle_mode
-            }
-        }
-        return tools
+    async def reset_chat(self):
+        """Clear the chat history, run on the event loop so it waits for any request in progress"""
+        async with self.get_chat_lock():
+            self.history = []
+            self.summary = []
+            self.summary_text = ""
 
     def check_connection(self):
-        """Check if we can connect to Gemini API"""
+        """Check the Gemini API key is set and the model is initialised
+        connection errors are reported by the request itself"""
+        if self.connection_verified:
+            return True
+
         if not self.api_key:
             print("chat: Gemini API key not set. Use 'chat set_gemini_key YOUR_API_KEY'")
             return False
-            
+
+        # called from within a request so the chat history is left alone, it is empty until a model exists
         if not self.model:
-            if not self.initialize_model():
+            if not self.initialize_model(reset_chat=False):
                 return False
-                
-        try:
-            # Test API connection with a simple query
-            response = self.model.generate_content("Test connection")
-            return True
-        except Exception as e:
-            print(f"chat: failed to connect to Gemini API: {e}")
-            return False
+
+        return True
+
+    def submit(self, coro):
+        """Run a coroutine on the event loop, returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
 
     def send_to_assistant(self, text):
+        """Send text to Gemini and wait until the response has been processed"""
+        self.submit(self.send_to_assistant_async(text)).result()
+
+    def get_chat_lock(self):
+        """Return the chat lock, must be called from the event loop"""
+        if self.chat_lock is None:
+            self.chat_lock = asyncio.Lock()
+        return self.chat_lock
+
+    async def send_to_assistant_async(self, text):
         """Send text to Gemini and process the response with tool calls"""
-        with self.send_lock:
-            if not self.check_connection():
+        async with self.get_chat_lock():
+            if not self.connection_verified and not await self.loop.run_in_executor(None, self.check_connection):
                 self.send_reply("chat: failed to connect to Gemini API")
                 return
 
+            # history is restored to this length if the exchange fails part way through
+            history_length = len(self.history)
             try:
                 self.send_status("Generating response...")
-                
+
                 # Send message to Gemini
-                response = self.chat.send_message(text)
-                
+                request = glm.Content(role="user", parts=[glm.Part(text=text)])
+                response = await self.generate(request)
+
                 # Handle the response including any potential tool calls
-                self.handle_gemini_response(response)
-                
+                await self.handle_gemini_response(request, response)
+
+                self.connection_verified = True
+
             except Exception as e:
+                # remove the incomplete exchange so the history never ends on an unanswered function call
+                del self.history[history_length:]
+                self.connection_verified = False
                 error_message = f"Error: {str(e)}"
                 print(f"chat: {error_message}")
                 self.send_status(error_message)
+                return
+
+            # keep the history sent with each request bounded
+            await self.compact_history()
 
-    def handle_gemini_response(self, response):
-        """Process Gemini response and handle any tool calls"""
-        if not response or not response.candidates:
-            self.send_reply("No response received from Gemini")
+    async def generate(self, content):
+        """Send content to Gemini following the chat history, returns the streamed response
+        content is added to the history by handle_gemini_response once the response is complete"""
+        return await self.model.generate_content_async(self.summary + self.history + [content], stream=True)
+
+    async def compact_history(self):
+        """Replace the oldest half of the chat history with a summary once it grows too long"""
+        if len(self.history) <= HISTORY_MAX_CONTENTS:
             return
-            
-        # Extract the response parts
-        for candidate in response.candidates:
-            if not hasattr(candidate, 'content') or not candidate.content:
-                continue
-                
-            # Check for text content
-            for part in candidate.content.parts:
-                # Handle regular text
-                if hasattr(part, 'text') and part.text:
-                    self.send_reply(part.text)
-                    
-                # Handle function calls (tool calls)
-                if hasattr(part, 'function_call'):
-                    self.handle_function_call(part.function_call)
-        
+
+        # split at the start of a user turn so function calls stay with their responses
+        split = len(self.history) // 2
+        while split < len(self.history) and not self.is_user_text(self.history[split]):
+            split += 1
+        if split >= len(self.history):
+            return
+
+        try:
+            prompt = HISTORY_SUMMARY_PROMPT + self.summary_text + "\n" + self.history_to_text(self.history[:split])
+            response = await self.summary_model.generate_content_async(prompt)
+            self.summary_text = response.text
+        except Exception as e:
+            print(f"chat: failed to summarise chat history: {e}")
+            return
+
+        self.summary = [
+            glm.Content(role="user", parts=[glm.Part(text="Summary of the conversation so far:\n" + self.summary_text)]),
+            glm.Content(role="model", parts=[glm.Part(text="Understood.")])]
+        self.history = self.history[split:]
+
+    def is_user_text(self, content):
+        """Return True if content is a user message (rather than a function response)"""
+        return content.role == "user" and any(getattr(part, 'text', None) for part in content.parts)
+
+    def history_to_text(self, contents):
+        """Convert chat history contents to text for summarising"""
+        lines = []
+        for content in contents:
+            for part in content.parts:
+                if getattr(part, 'text', None):
+                    lines.append(f"{content.role}: {part.text}")
+                function_call = getattr(part, 'function_call', None)
+                if function_call is not None and function_call.name:
+                    lines.append(f"{content.role}: called {function_call.name}")
+                function_response = getattr(part, 'function_response', None)
+                if function_response is not None and function_response.name:
+                    lines.append(f"{function_response.name} returned {function_response.response}")
+        return "\n".join(lines)
+
+    async def handle_gemini_response(self, request, response):
+        """Process streamed Gemini response to request and handle any tool calls
+        raises an exception if the response or a response to a tool call fails"""
+        # Extract the response parts as they arrive, text is sent immediately,
+        # function calls are collected until the response is complete
+        function_calls = []
+        texts = []
+        received = False
+        async for chunk in response:
+            for candidate in chunk.candidates:
+                if not hasattr(candidate, 'content') or not candidate.content:
+                    continue
+
+                for part in candidate.content.parts:
+                    received = True
+
+                    # Handle regular text
+                    if hasattr(part, 'text') and part.text:
+                        self.send_reply(part.text)
+                        texts.append(part.text)
+
+                    # Collect function calls (tool calls)
+                    function_call = getattr(part, 'function_call', None)
+                    if function_call is not None and function_call.name:
+                        function_calls.append(function_call)
+
+        if not received:
+            raise RuntimeError("No response received from Gemini")
+
+        # add the request and reply to the chat history now the response is complete
+        reply_parts = []
+        if texts:
+            reply_parts.append(glm.Part(text="".join(texts)))
+        reply_parts.extend(glm.Part(function_call=fc) for fc in function_calls)
+        self.history.append(request)
+        self.history.append(glm.Content(role="model", parts=reply_parts))
+
+        if function_calls:
+            # run the function calls concurrently (see VEHICLE_CHANGING_TOOLS) and send the results back in a single message
+            outputs = await asyncio.gather(*(self.handle_function_call(fc) for fc in function_calls))
+            parts = [glm.Part(function_response=glm.FunctionResponse(name=fc.name, response={"result": output}))
+                     for fc, output in zip(function_calls, outputs)]
+            request = glm.Content(role="user", parts=parts)
+            response = await self.generate(request)
+
+            # Process the response to the function calls
+            await self.handle_gemini_response(request, response)
+            return
+
         self.send_status("Ready")
 
-    def handle_function_call(self, function_call):
-        """Handle function call from Gemini"""
+    async def handle_function_call(self, function_call):
+        """Call the function requested by Gemini and return its output"""
         # Extract function name and arguments
         func_name = function_call.name
-        if not func_name:
-            print("chat: Empty function name received")
-            return
-            
+
+        # args is normally already a mapping, older SDKs may provide a JSON string
         try:
-            arguments = json.loads(function_call.args)
-        except:
+            if isinstance(function_call.args, (str, bytes)):
+                arguments = json.loads(function_call.args)
+            else:
+                arguments = dict(function_call.args) if function_call.args else {}
+        except (TypeError, ValueError):
             arguments = {}
             
         print(f"chat: Handling function call: {func_name}")
@@ -285,7 +553,9 @@ class ChatGemini:
             "get_vehicle_type",
             "get_vehicle_state",
             "get_parameter",
-            "set_parameter"
+            "set_parameter",
+            "set_parameters",
+            "set_wakeup_timer"
         ]
         
         # Call function if supported
@@ -294,8 +564,11 @@ class ChatGemini:
         
         if func_name in supported_funcs and func is not None:
             try:
-                # Call the function
-                output = func(arguments)
+                # Call the function in a worker thread as it may block waiting for the vehicle
+                if func_name in VEHICLE_CHANGING_TOOLS:
+                    output = await self.loop.run_in_executor(None, self.call_with_vehicle_lock, func, arguments)
+                else:
+                    output = await self.loop.run_in_executor(None, func, arguments)
             except Exception as e:
                 error_message = f"{func_name}: function call failed - {str(e)}"
                 print(f"chat: {error_message}")
@@ -303,19 +576,13 @@ class ChatGemini:
         else:
             print(f"chat: Unrecognized function name: {func_name}")
             output = f"Unrecognized function call: {func_name}"
-        
-        # Send function result back to Gemini
-        try:
-            result_json = json.dumps(output)
-            # For Gemini 1.5, the API is different:
-            response = self.chat.send_message(
-                f"Function result for {func_name}: {result_json}"
-            )
-            
-            # Process the response to this function call
-            self.handle_gemini_response(response)
-        except Exception as e:
-            print(f"chat: Error sending function response: {e}")
+
+        return output
+
+    def call_with_vehicle_lock(self, func, arguments):
+        """Call a tool that changes the vehicle, waiting for any other such tool to finish first"""
+        with self.vehicle_lock:
+            return func(arguments)
 
     # Function implementations - reused from the OpenAI implementation
     def get_current_datetime(self, arguments):
@@ -326,30 +593,7 @@ class ChatGemini:
         hearbeat_msg = self.mpstate.master().messages.get('HEARTBEAT', None)
         vehicle_type_str = "unknown"
         if hearbeat_msg is not None:
-            if hearbeat_msg.type in [mavutil.mavlink.MAV_TYPE_FIXED_WING,
-                                    mavutil.mavlink.MAV_TYPE_VTOL_DUOROTOR,
-                                    mavutil.mavlink.MAV_TYPE_VTOL_QUADROTOR,
-                                    mavutil.mavlink.MAV_TYPE_VTOL_TILTROTOR]:
-                vehicle_type_str = "Plane"
-            if hearbeat_msg.type == mavutil.mavlink.MAV_TYPE_GROUND_ROVER:
-                vehicle_type_str = "Rover"
-            if hearbeat_msg.type == mavutil.mavlink.MAV_TYPE_SURFACE_BOAT:
-                vehicle_type_str = "Boat"
-            if hearbeat_msg.type == mavutil.mavlink.MAV_TYPE_SUBMARINE:
-                vehicle_type_str = "Sub"
-            if hearbeat_msg.type in [mavutil.mavlink.MAV_TYPE_QUADROTOR,
-                                    mavutil.mavlink.MAV_TYPE_COAXIAL,
-                                    mavutil.mavlink.MAV_TYPE_HEXAROTOR,
-                                    mavutil.mavlink.MAV_TYPE_OCTOROTOR,
-                                    mavutil.mavlink.MAV_TYPE_TRICOPTER,
-                                    mavutil.mavlink.MAV_TYPE_DODECAROTOR]:
-                vehicle_type_str = "Copter"
-            if hearbeat_msg.type == mavutil.mavlink.MAV_TYPE_HELICOPTER:
-                vehicle_type_str = "Heli"
-            if hearbeat_msg.type == mavutil.mavlink.MAV_TYPE_ANTENNA_TRACKER:
-                vehicle_type_str = "Tracker"
-            if hearbeat_msg.type == mavutil.mavlink.MAV_TYPE_AIRSHIP:
-                vehicle_type_str = "Blimp"
+            vehicle_type_str = VEHICLE_TYPES.get(hearbeat_msg.type, "unknown")
         return {
             "vehicle_type": vehicle_type_str
         }
@@ -392,14 +636,16 @@ class ChatGemini:
 
         # handle param name containing regex
         if self.contains_regex(param_name):
-            pattern = re.compile(param_name)
-            for existing_param_name in sorted(self.mpstate.mav_param.keys()):
+            pattern = compile_param_pattern(param_name)
+            # copy items in case parameters are received while we are searching
+            for existing_param_name, param_value in list(self.mpstate.mav_param.items()):
                 if pattern.match(existing_param_name) is not None:
-                    param_value = self.mpstate.functions.get_mav_param(existing_param_name, None)
                     if param_value is None:
                         print("chat: get_parameter unable to get " + existing_param_name)
                     else:
                         param_list[existing_param_name] = param_value
+            # sort only the matches so the reply is in a consistent order
+            param_list = dict(sorted(param_list.items()))
         else:
             # handle simple case of a single parameter name
             param_value = self.mpstate.functions.get_mav_param(param_name, None)
@@ -419,28 +665,73 @@ class ChatGemini:
         self.mpstate.functions.param_set(param_name, param_value, retries=3)
         return "set_parameter: parameter value set"
 
+    def set_parameters(self, arguments):
+        params = arguments.get("params", None)
+        if not params:
+            return "set_parameters: params not specified"
+
+        pending = {}
+        for param in params:
+            param_name = param.get("name", None)
+            param_value = param.get("value", None)
+            if param_name is None or param_value is None:
+                return "set_parameters: name or value not specified"
+            pending[param_name.upper()] = float(param_value)
+
+        # send all parameters without waiting for each to be acknowledged
+        for param_name, param_value in pending.items():
+            self.mpstate.master().param_set_send(param_name, param_value)
+
+        # wait for the vehicle to report the new values
+        start_time = time.time()
+        while pending and time.time() - start_time < SET_PARAMETERS_TIMEOUT:
+            time.sleep(0.1)
+            for param_name, param_value in list(pending.items()):
+                current_value = self.mpstate.mav_param.get(param_name, None)
+                if current_value is not None and math.isclose(current_value, param_value, rel_tol=1e-6, abs_tol=1e-6):
+                    del pending[param_name]
+
+        if pending:
+            return "set_parameters: timeout setting " + ", ".join(sorted(pending))
+        return "set_parameters: parameter values set"
+
+    def set_wakeup_timer(self, arguments):
+        seconds = arguments.get("seconds", -1)
+        if seconds < 0:
+            return "set_wakeup_timer: seconds not specified"
+        message = arguments.get("message", None)
+        if message is None:
+            return "set_wakeup_timer: message not specified"
+        self.add_wakeup_timer(time.time() + seconds, message)
+        return "set_wakeup_timer: wakeup timer set"
+
     # Support functions
+    # add a wakeup timer, may be called from any thread
+    def add_wakeup_timer(self, wakeup_time, message):
+        self.loop.call_soon_threadsafe(self.push_wakeup_timer, wakeup_time, message)
+
+    def push_wakeup_timer(self, wakeup_time, message):
+        heapq.heappush(self.wakeup_schedule, (wakeup_time, next(self.wakeup_seq), message))
+        self.schedule_wakeup()
+
+    # arrange for check_wakeup_timers to be called when the earliest timer expires
+    def schedule_wakeup(self):
+        if self.wakeup_handle is not None:
+            self.wakeup_handle.cancel()
+            self.wakeup_handle = None
+        if self.wakeup_schedule:
+            delay = max(0, self.wakeup_schedule[0][0] - time.time())
+            self.wakeup_handle = self.loop.call_at(self.loop.time() + delay, self.check_wakeup_timers)
+
+    # send expired wakeup timer messages to the assistant
+    # called from the event loop when the earliest timer expires
     def check_wakeup_timers(self):
-        while True:
-            # wait for one second
-            time.sleep(1)
-
-            # check if any timers are set
-            if len(self.wakeup_schedule) == 0:
-                continue
-
-            # get current time
-            now = time.time()
-
-            # check if any timers have expired
-            for wakeup_timer in list(self.wakeup_schedule):
-                if now >= wakeup_timer["time"]:
-                    # send message to assistant
-                    message = "WAKEUP:" + wakeup_timer["message"]
-                    self.send_to_assistant(message)
-
-                    # remove from wakeup schedule
-                    self.wakeup_schedule.remove(wakeup_timer)
+        self.wakeup_handle = None
+        now = time.time()
+        while self.wakeup_schedule and self.wakeup_schedule[0][0] <= now:
+            _, _, message = heapq.heappop(self.wakeup_schedule)
+            self.loop.create_task(self.send_to_assistant_async("WAKEUP:" + message))
+        self.schedule_wakeup()
 
     def send_status(self, status):
         if self.status_cb:
@@ -451,139 +742,4 @@ class ChatGemini:
             self.reply_cb(reply)
 
     def contains_regex(self, string):
-        regex_characters = ".^$*+?{}[]\\|()"
-        for x in regex_characters:
-            if string.count(x):
-                return True
-        return False
-    
-
-
-
-
-
-
-
-
-
-
-# '''
-# AI Chat Module Gemini interface
-
-# Google Generative AI (Gemini) API integration for MAVProxy chat
-
-# AP_FLAKE8_CLEAN
-# '''
-
-# import time
-# import json
-# import os.path
-# from threading import Lock
-
-# try:
-#     import google.generativeai as genai
-# except ImportError:
-#     print("chat: failed to import google.generativeai. Install with: pip install google-generativeai")
-
-# class ChatGemini:
-#     def __init__(self, mpstate, status_cb=None, reply_cb=None):
-#         # API configuration
-#         self.api_key = None
-#         self.config_file = os.path.join(os.path.expanduser("~"), ".gemini_api_key")
-#         self.load_api_key()
-        
-#         # Keep references to callbacks and state
-#         self.mpstate = mpstate
-#         self.status_cb = status_cb
-#         self.reply_cb = reply_cb
-#         self.send_lock = Lock()
-        
-#         # Initialize model only if API key is available
-#         self.model = None
-#         self.chat = None
-#         if self.api_key:
-#             self.initialize_model()
-    
-#     def load_api_key(self):
-#         """Load API key from config file"""
-#         if os.path.exists(self.config_file):
-#             try:
-#                 with open(self.config_file, 'r') as f:
-#                     self.api_key = f.read().strip()
-#                 print("chat: Loaded Gemini API key from config file")
-#             except Exception as e:
-#                 print(f"chat: Failed to load API key: {e}")
-    
-#     def save_api_key(self, api_key):
-#         """Save API key to config file"""
-#         try:
-#             with open(self.config_file, 'w') as f:
-#                 f.write(api_key)
-#             self.api_key = api_key
-#             print("chat: Saved Gemini API key to config file")
-            
-#             # Initialize model with new API key
-#             return self.initialize_model()
-#         except Exception as e:
-#             print(f"chat: Failed to save API key: {e}")
-#             return False
-    
-#     def initialize_model(self):
-#         """Initialize the Gemini model with current API key"""
-#         try:
-#             genai.configure(api_key=self.api_key)
-            
-#             # Use the recommended newer model directly
-#             model_name = "gemini-1.5-flash"
-#             print(f"chat: Using model {model_name}")
-#             self.model = genai.GenerativeModel(model_name)
-#             self.chat = self.model.start_chat(history=[])
-#             print("chat: Successfully configured Gemini API")
-#             return True
-#         except Exception as e:
-#             print(f"chat: Failed to initialize Gemini model: {e}")
-#             return False
-
-#     def check_connection(self):
-#         if not self.api_key:
-#             print("chat: Gemini API key not set. Use 'chat set_gemini_key YOUR_API_KEY'")
-#             return False
-            
-#         if not self.model:
-#             if not self.initialize_model():
-#                 return False
-                
-#         try:
-#             # Test API connection with a simple query
-#             response = self.model.generate_content("Test connection")
-#             return True
-#         except Exception as e:
-#             print(f"chat: failed to connect to Gemini API: {e}")
-#             return False
-
-#     def send_to_assistant(self, text):
-#         with self.send_lock:
-#             if not self.check_connection():
-#                 self.send_reply("chat: failed to connect to Gemini API")
-#                 return
-
-#             try:
-#                 self.send_status("Generating response...")
-#                 response = self.chat.send_message(text)
-#                 if response:
-#                     self.send_reply(response.text)
-#                     self.send_status("Ready")
-#                 else:
-#                     self.send_status("Error: No response from Gemini")
-#             except Exception as e:
-#                 error_message = f"Error: {str(e)}"
-#                 print(f"chat: {error_message}")
-#                 self.send_status(error_message)
-
-#     def send_status(self, status):
-#         if self.status_cb:
-#             self.status_cb(status)
-
-#     def send_reply(self, reply):
-#         if self.reply_cb:
-#             self.reply_cb(reply)
+        return not REGEX_CHARACTERS.isdisjoint(string)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+'''
+Custom Chat Module window
+Run as a separate process by the custom_chat module
+
+AP_FLAKE8_CLEAN
+'''
+
+import sys
+import os
+
+
+if __name__ == "__main__":
+    # Ensure environment variables are set properly
+    os.environ['DISPLAY'] = os.environ.get('DISPLAY', ':0')
+
+    print("Starting minimal chat window test...")
+
+    try:
+        import wx
+        print("wxPython imported successfully")
+    except ImportError as e:
+        print(f"ERROR: wxPython not available: {e}")
+        sys.exit(1)
+
+    # Create a minimal wxPython app
+    app = wx.App(False)
+    frame = wx.Frame(None, title="Gemini Chat Test", size=(400, 200))
+    panel = wx.Panel(frame)
+
+    # Make window more noticeable
+    frame.SetBackgroundColour(wx.Colour(220, 220, 255))
+    text = wx.StaticText(panel, label="If you can see this, wxPython is working!", pos=(50, 30))
+    button = wx.Button(panel, label="Close", pos=(150, 100))
+    button.Bind(wx.EVT_BUTTON, lambda evt: frame.Close())
+
+    frame.Center()
+    frame.Show()
+    print("Window should be visible now")
+
+    # This keeps the window open
+    app.MainLoop()
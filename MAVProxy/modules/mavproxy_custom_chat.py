@@ -10,19 +10,31 @@ from MAVProxy.modules.lib import mp_module
 from MAVProxy.modules.lib import mp_util
 import sys
 import os
+import shutil
 import subprocess
-import tempfile
 import json
 
+# chat window script, run in a separate process
+CHAT_WINDOW_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mavproxy_chat", "custom_chat_window.py")
+
+# terminals the chat window can be launched in, in order of preference
+TERMINALS = [["xterm", "-e"], ["gnome-terminal", "--"]]
+
+# shell command run in the terminal, waits for Enter after the script exits so its output can be read
+# the python interpreter and script are passed as $0 and $1 so paths need no quoting
+TERMINAL_COMMAND = ["sh", "-c", '"$0" "$1"; printf "Press Enter to continue..."; read line']
+
 class CustomChatModule(mp_module.MPModule):
     def __init__(self, mpstate):
         super(CustomChatModule, self).__init__(mpstate, "custom_chat", "Gemini Chat Interface")
         self.add_command('custom_chat', self.cmd_custom_chat, "Open Gemini chat window")
         self.window_process = None
-        self.temp_dir = None
         self.api_key = None
         self.config_file = os.path.join(os.path.expanduser("~"), ".mavproxy_custom_chat.json")
         
+        # find a terminal to launch the chat window in, None to launch directly
+        self.terminal = next((t for t in TERMINALS if shutil.which(t[0]) is not None), None)
+
         # Load API key if it exists
         self.load_api_key()
         
@@ -51,75 +63,25 @@ class CustomChatModule(mp_module.MPModule):
     def launch_chat_window(self):
         '''Launch chat window as a separate process'''
         try:
-            # Create a temporary directory for our script
-            self.temp_dir = tempfile.mkdtemp(prefix="mavproxy_custom_chat_")
-            chat_script = os.path.join(self.temp_dir, "custom_chat_window.py")
-            print(f"custom_chat: Created temporary script at {chat_script}")
-            
-            with open(chat_script, 'w') as f:
-                f.write('''#!/usr/bin/env python3
-import sys
-import os
-
-# Ensure environment variables are set properly
-os.environ['DISPLAY'] = os.environ.get('DISPLAY', ':0')
-
-print("Starting minimal chat window test...")
-
-try:
-    import wx
-    print("wxPython imported successfully")
-except ImportError as e:
-    print(f"ERROR: wxPython not available: {e}")
-    sys.exit(1)
-
-# Create a minimal wxPython app
-app = wx.App(False)
-frame = wx.Frame(None, title="Gemini Chat Test", size=(400, 200))
-panel = wx.Panel(frame)
-
-# Make window more noticeable
-frame.SetBackgroundColour(wx.Colour(220, 220, 255))
-text = wx.StaticText(panel, label="If you can see this, wxPython is working!", pos=(50, 30))
-button = wx.Button(panel, label="Close", pos=(150, 100))
-button.Bind(wx.EVT_BUTTON, lambda evt: frame.Close())
-
-frame.Center()
-frame.Show()
-print("Window should be visible now")
-
-# This keeps the window open
-app.MainLoop()
-''')
-            os.chmod(chat_script, 0o755)
+            if self.terminal is not None:
+                # Launch in terminal window so output can be seen
+                self.window_process = subprocess.Popen(self.terminal + TERMINAL_COMMAND + [sys.executable, CHAT_WINDOW_SCRIPT])
+                print(f"custom_chat: Launched with {self.terminal[0]}")
+            else:
+                # Fall back to direct Python execution
+                print("custom_chat: Launching directly with Python")
+                self.window_process = subprocess.Popen(
+                    [sys.executable, CHAT_WINDOW_SCRIPT],
+                    start_new_session=True  # This is key - creates a new process group
+                )
 
-            # Different approach: Launch in terminal window if available
-            try:
-                # Try with xterm first
-                self.window_process = subprocess.Popen(['xterm', '-e', f'python3 {chat_script}; read -p "Press Enter to continue..."'])
-                print("custom_chat: Launched with xterm")
-            except FileNotFoundError:
-                try:
-                    # Try with gnome-terminal
-                    self.window_process = subprocess.Popen(['gnome-terminal', '--', 'python3', chat_script])
-                    print("custom_chat: Launched with gnome-terminal")
-                except FileNotFoundError:
-                    # Fall back to direct Python execution
-                    print("custom_chat: Launching directly with Python")
-                    env = os.environ.copy()
-                    self.window_process = subprocess.Popen(
-                        [sys.executable, chat_script],
-                        env=env,
-                        start_new_session=True  # This is key - creates a new process group
-                    )
-                    
             print(f"custom_chat: Process started with PID: {self.window_process.pid}")
-            
+
         except Exception as e:
             import traceback
             traceback.print_exc()
             print(f"custom_chat: Failed to launch window: {e}")
-    
+
     def cmd_custom_chat(self, args):
         '''Command handler for custom_chat'''
         if len(args) > 0 and args[0] == 'set_key':
@@ -139,14 +101,6 @@ app.MainLoop()
         '''unload module'''
         if self.window_process is not None and self.window_process.poll() is None:
             self.window_process.terminate()
-            
-        # Clean up temporary directory if it exists
-        if self.temp_dir and os.path.exists(self.temp_dir):
-            import shutil
-            try:
-                shutil.rmtree(self.temp_dir)
-            except:
-                pass
 
 def init(mpstate):
     '''initialize module'''
@@ -0,0 +1 @@
+'''Llama chat client and window, shared by the llama and llamachat modules'''
@@ -0,0 +1,296 @@
+'''
+Llama chat client
+Request session, worker threads, reply cache and chat window shared by the llama and llamachat modules
+
+AP_FLAKE8_CLEAN
+'''
+
+import threading
+import queue
+import collections
+import re
+import json
+
+# orjson parses replies faster if it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+API_BASE_URL = "https://llama8b.gaia.domains/v1"
+MODEL_NAME = "llama"
+API_KEY = "GAIA"
+MAX_TOKENS = 150
+
+# parts of each completion request that do not depend on the prompt
+COMPLETIONS_URL = f"{API_BASE_URL}/completions"
+AUTH_HEADERS = {"Authorization": f"Bearer {API_KEY}"}
+BASE_BODY = {"model": MODEL_NAME, "max_tokens": MAX_TOKENS}
+
+# (connect, read) timeout for requests, so a hung server cannot block a worker thread forever
+REQUEST_TIMEOUT = (3.05, 60)
+
+# wx and requests are imported when first needed, so loading this module does not pull them in
+wx = None
+requests = None
+
+# HTTP session shared by all requests so connections to the server are kept alive and reused
+# created by the first worker thread to need it
+SESSION = None
+SESSION_LOCK = threading.Lock()
+
+# lines of chat history kept, older lines are removed in one go once HISTORY_TRIM_LINES more have built up
+HISTORY_MAX_LINES = 200
+HISTORY_TRIM_LINES = 50
+
+# prompts waiting to be sent as (message, on_reply), handled by REQUEST_WORKERS worker threads
+# these are daemon threads (ThreadPoolExecutor workers are joined at exit) so a request in progress
+# never delays MAVProxy exiting
+REQUEST_QUEUE = queue.Queue()
+REQUEST_WORKERS = 4
+workers = []
+
+# replies to previous prompts keyed on (model, normalised prompt, max_tokens), oldest first
+# the prompt is normalised so changes in case, spacing and trailing punctuation still match
+REPLY_CACHE = collections.OrderedDict()
+REPLY_CACHE_SIZE = 128
+REPLY_CACHE_LOCK = threading.Lock()
+
+# also match prompts with similar meaning using sentence embeddings (requires sentence_transformers)
+SEMANTIC_CACHE = False
+SEMANTIC_CACHE_MODEL = "all-MiniLM-L6-v2"
+SEMANTIC_CACHE_THRESHOLD = 0.92
+semantic_model = None
+semantic_entries = []  # list of (embedding, reply), oldest first
+
+
+def normalize_prompt(message):
+    '''fold case and whitespace and remove trailing sentence punctuation, other characters can change the meaning'''
+    return re.sub(r"\s+", " ", message.lower()).strip().rstrip(".?!").rstrip()
+
+
+def prompt_embedding(message):
+    '''return the normalised sentence embedding of message, loading the model on first use'''
+    global semantic_model
+    if semantic_model is None:
+        from sentence_transformers import SentenceTransformer
+        semantic_model = SentenceTransformer(SEMANTIC_CACHE_MODEL)
+    return semantic_model.encode(message, normalize_embeddings=True)
+
+
+def add_to_cache(cache, key, value):
+    cache[key] = value
+    if len(cache) > REPLY_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def get_cached_reply(message):
+    '''return the cached reply for a prompt, or None'''
+    normalized = normalize_prompt(message)
+    if not normalized:
+        # prompts with no content are never cached
+        return None
+    with REPLY_CACHE_LOCK:
+        reply = REPLY_CACHE.get((MODEL_NAME, normalized, MAX_TOKENS))
+        if reply is not None or not SEMANTIC_CACHE or not semantic_entries:
+            return reply
+        entries = list(semantic_entries)
+
+    import numpy
+    similarity = numpy.dot(numpy.array([e[0] for e in entries]), prompt_embedding(message))
+    best = int(numpy.argmax(similarity))
+    if similarity[best] >= SEMANTIC_CACHE_THRESHOLD:
+        return entries[best][1]
+    return None
+
+
+def cache_reply(message, reply):
+    '''add the reply to a prompt to the caches, discarding the oldest entries if full'''
+    normalized = normalize_prompt(message)
+    if not normalized:
+        return
+    embedding = prompt_embedding(message) if SEMANTIC_CACHE else None
+    with REPLY_CACHE_LOCK:
+        add_to_cache(REPLY_CACHE, (MODEL_NAME, normalized, MAX_TOKENS), reply)
+        if embedding is not None:
+            semantic_entries.append((embedding, reply))
+            if len(semantic_entries) > REPLY_CACHE_SIZE:
+                semantic_entries.pop(0)
+
+
+def create_session():
+    '''import requests and create the shared HTTP session if not already done'''
+    global requests, SESSION
+    with SESSION_LOCK:
+        if SESSION is not None:
+            return
+
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        session.headers.update(AUTH_HEADERS)
+        SESSION = session
+
+
+def send_prompt(message, on_reply):
+    '''send a prompt on a worker thread, on_reply(text, status) is called from that thread with the
+    text to add to the chat history (None on error) and the new status'''
+    if not workers:
+        for i in range(REQUEST_WORKERS):
+            worker = threading.Thread(target=request_worker, name=f"llama_{i}", daemon=True)
+            worker.start()
+            workers.append(worker)
+    REQUEST_QUEUE.put((message, on_reply))
+
+
+def request_worker():
+    '''send queued prompts, never returns'''
+    while True:
+        message, on_reply = REQUEST_QUEUE.get()
+        try:
+            request_reply(message, on_reply)
+        except Exception as e:
+            # on_reply fails if the window was destroyed while the request was in progress
+            print(f"llama: failed to deliver reply: {str(e)}")
+
+
+def request_reply(message, on_reply):
+    try:
+        reply = get_cached_reply(message)
+        if reply is not None:
+            on_reply(f"Assistant: {reply}\n", "Ready")
+            return
+        create_session()
+        response = SESSION.post(COMPLETIONS_URL, json={**BASE_BODY, "prompt": message},
+                                timeout=REQUEST_TIMEOUT)
+        if response.status_code == 200:
+            reply = json_loads(response.content)["choices"][0]["text"]
+            cache_reply(message, reply)
+            on_reply(f"Assistant: {reply}\n", "Ready")
+        else:
+            on_reply(None, f"Error: {response.status_code}")
+    except ImportError as e:
+        # checked first as requests.exceptions is unavailable if requests failed to import
+        on_reply(None, f"Error: {str(e)}")
+    except requests.exceptions.Timeout:
+        on_reply(None, "Timeout")
+    except Exception as e:
+        on_reply(None, f"Error: {str(e)}")
+
+
+# chat window class and reply event, defined by import_gui
+ChatFrame = None
+LlamaReplyEvent = None
+EVT_LLAMA_REPLY = None
+
+
+def import_gui():
+    '''import wx and define the chat window class'''
+    global wx, ChatFrame, LlamaReplyEvent, EVT_LLAMA_REPLY
+    if ChatFrame is not None:
+        return
+
+    import wx
+
+    # posted from a worker thread once per reply, carrying the text to add and the new status
+    LlamaReplyEvent = wx.NewEventType()
+    EVT_LLAMA_REPLY = wx.PyEventBinder(LlamaReplyEvent, 1)
+
+    class ChatFrame(wx.Frame):
+        def __init__(self):
+            wx.Frame.__init__(self, None, title="Llama Chat", size=(600, 400))
+
+            panel = wx.Panel(self)
+            vbox = wx.BoxSizer(wx.VERTICAL)
+
+            self.chat_history = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY)
+            self.status_text = wx.TextCtrl(panel, style=wx.TE_READONLY)
+            self.input_field = wx.TextCtrl(panel, style=wx.TE_PROCESS_ENTER)
+            self.send_button = wx.Button(panel, label="Send")
+
+            vbox.Add(self.chat_history, 1, wx.EXPAND | wx.ALL, 5)
+            vbox.Add(self.status_text, 0, wx.EXPAND | wx.ALL, 5)
+            vbox.Add(self.input_field, 0, wx.EXPAND | wx.ALL, 5)
+            vbox.Add(self.send_button, 0, wx.EXPAND | wx.ALL, 5)
+            panel.SetSizer(vbox)
+
+            self.Bind(wx.EVT_CLOSE, self.on_close)
+            self.input_field.Bind(wx.EVT_TEXT_ENTER, self.on_send)
+            self.send_button.Bind(wx.EVT_BUTTON, self.on_send)
+            self.Bind(EVT_LLAMA_REPLY, self.on_reply)
+
+            # text waiting to be added to the chat history, written in one go by flush_pending
+            self.pending = collections.deque()
+            self.pending_status = None
+            self.flush_scheduled = False
+
+            # only one prompt is sent at a time, input is disabled until its reply arrives
+            self.in_flight = False
+
+            self.set_status("Ready")
+
+        def on_close(self, event):
+            # hide the window instead of destroying it
+            self.Hide()
+
+        def on_send(self, event):
+            if self.in_flight:
+                return
+            message = self.input_field.GetValue()
+            if message:
+                self.in_flight = True
+                self.send_button.Disable()
+                self.input_field.Disable()
+                self.queue_append(f"You: {message}\n")
+                self.input_field.SetValue("")
+                self.set_status("Sending...")
+                send_prompt(message, self.post_reply)
+
+        def post_reply(self, text, status):
+            '''pass the reply text (or None) and new status to the GUI thread in a single event'''
+            evt = wx.PyEvent()
+            evt.SetEventType(LlamaReplyEvent)
+            evt.text = text
+            evt.status = status
+            wx.PostEvent(self, evt)
+
+        def on_reply(self, evt):
+            self.in_flight = False
+            self.send_button.Enable()
+            self.input_field.Enable()
+            if evt.text is None:
+                self.set_status(evt.status)
+            else:
+                self.queue_append(evt.text, evt.status)
+
+        def append_text(self, text):
+            self.chat_history.AppendText(text)
+            lines = self.chat_history.GetNumberOfLines()
+            if lines > HISTORY_MAX_LINES + HISTORY_TRIM_LINES:
+                cut = self.chat_history.XYToPosition(0, lines - HISTORY_MAX_LINES)
+                self.chat_history.Remove(0, cut)
+
+        def queue_append(self, text, status=None):
+            '''queue text (and optionally a new status) to be shown shortly, must be called from the GUI thread'''
+            self.pending.append(text)
+            if status is not None:
+                self.pending_status = status
+            if not self.flush_scheduled:
+                self.flush_scheduled = True
+                wx.CallLater(30, self.flush_pending)
+
+        def flush_pending(self):
+            '''add all queued text to the chat history in a single update'''
+            self.flush_scheduled = False
+            if self.pending:
+                self.append_text("".join(self.pending))
+                self.pending.clear()
+            if self.pending_status is not None:
+                self.set_status(self.pending_status)
+                self.pending_status = None
+
+        def set_status(self, text):
+            self.status_text.SetValue(text)
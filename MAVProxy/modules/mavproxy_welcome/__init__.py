@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+'''
+Welcome Module for MAVProxy
+Displays a welcome message for ArduPilot
+
+AP_FLAKE8_CLEAN
+'''
+
+from MAVProxy.modules.lib import mp_module
+from MAVProxy.modules.lib import mp_util
+import sys
+import subprocess
+
+
+class WelcomeModule(mp_module.MPModule):
+    def __init__(self, mpstate):
+        super(WelcomeModule, self).__init__(mpstate, "welcome", "ArduPilot Welcome Screen")
+        self.add_command('welcome', self.cmd_welcome, "Show welcome screen")
+        self.window_process = None
+
+        # Launch welcome window on module load
+        self.launch_welcome_window()
+
+    def launch_welcome_window(self):
+        '''Launch welcome window as a separate process'''
+        # the window needs wx in the child process, don't start an interpreter that can't show it
+        if not mp_util.has_wxpython:
+            print("welcome: wxPython not installed")
+            return
+
+        try:
+            self.window_process = subprocess.Popen([sys.executable, "-m", "MAVProxy.modules.mavproxy_welcome.window"])
+        except Exception as e:
+            print(f"welcome: Failed to launch window: {str(e)}")
+
+    def cmd_welcome(self, args):
+        '''Command handler for welcome'''
+        if self.window_process is None or self.window_process.poll() is not None:
+            self.launch_welcome_window()
+        else:
+            print("welcome: Window is already running")
+
+    def unload(self):
+        '''unload module'''
+        if self.window_process is not None and self.window_process.poll() is None:
+            self.window_process.terminate()
+
+
+def init(mpstate):
+    '''initialize module'''
+    return WelcomeModule(mpstate)
@@ -0,0 +1,57 @@
+'''
+Welcome Module window
+Displays a welcome message for ArduPilot, run by the welcome module in a child process with
+python -m MAVProxy.modules.mavproxy_welcome.window
+
+AP_FLAKE8_CLEAN
+'''
+
+from MAVProxy.modules.lib import wx_processguard  # noqa: F401
+from MAVProxy.modules.lib.wx_loader import wx
+
+WELCOME_MESSAGE = """
+ArduPilot is an open source autopilot system supporting:
+- Multi-copters
+- Traditional helicopters
+- Fixed wing aircraft
+- Rovers
+- Submarines
+- Antenna trackers
+
+Use the MAVProxy interface to control and monitor your vehicle.
+"""
+
+
+class WelcomeFrame(wx.Frame):
+    def __init__(self):
+        wx.Frame.__init__(self, None, title="ArduPilot Welcome", size=(600, 400))
+        panel = wx.Panel(self)
+        sizer = wx.BoxSizer(wx.VERTICAL)
+
+        # Title
+        title_font = wx.Font(24, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
+        title = wx.StaticText(panel, label="Welcome to ArduPilot")
+        title.SetFont(title_font)
+
+        # Message
+        message = wx.StaticText(panel, label=WELCOME_MESSAGE)
+
+        # Button
+        close_button = wx.Button(panel, label="Close")
+        close_button.Bind(wx.EVT_BUTTON, lambda evt: self.Close())
+
+        # Layout
+        sizer.Add(title, 0, wx.ALIGN_CENTER | wx.ALL, 20)
+        sizer.Add(message, 0, wx.EXPAND | wx.ALL, 20)
+        sizer.AddStretchSpacer()
+        sizer.Add(close_button, 0, wx.ALIGN_CENTER | wx.BOTTOM, 20)
+
+        panel.SetSizer(sizer)
+        self.Center()
+
+
+if __name__ == "__main__":
+    app = wx.App(False)
+    frame = WelcomeFrame()
+    frame.Show()
+    app.MainLoop()
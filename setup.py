@@ -91,6 +91,8 @@ on how to use MAVProxy.''',
                 'MAVProxy.modules.mavproxy_nokov',
                 'MAVProxy.modules.mavproxy_SIYI',
                 'MAVProxy.modules.mavproxy_chat',
+                'MAVProxy.modules.mavproxy_llamachat',
+                'MAVProxy.modules.mavproxy_welcome',
                 'MAVProxy.modules.lib',
                 'MAVProxy.modules.lib.ANUGA',
                 'MAVProxy.modules.lib.MacOS',